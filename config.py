@@ -1,6 +1,5 @@
 from PySide6.QtCore import QSize
 import numpy as np
-from math import sqrt
 
 
 WINDOW_TITLE = "Марковские цепи"
@@ -32,9 +31,18 @@ MAXIMUM_MATRIX_SIZE = 20
 MAXIMUM_T = 100
 
 EPS = 0.01
+MIXING_EPS = 0.05
 
 N = 100
 
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_BATCH_DELAY = 0.005
+SERVER_CACHE_SIZE = 4096
+SERVER_MAXIMUM_N = 10000
+SERVER_TIMEOUT = 30
+SERVER_MAXIMUM_BODY = 1 << 20
+
 P1 = np.matrix([[1/2, 1/2, 0, 0, 0],
                [3/4, 1/4, 0, 0, 0],
                [0, 0, 1/3, 2/3, 0],
@@ -48,10 +56,7 @@ def is_equal(v1_: float, v2_: float = 0) -> bool:
     return abs(v1_ - v2_) <= EPS
 
 def norm(v: np.array) -> float:
-    n2 = 0.
-    for i in range(len(v)):
-        n2 += v[i] * v[i]
-    return sqrt(n2)
+    return float(np.linalg.norm(v))
 
 GRAPH_OPTIONS = '''
   const options = {
@@ -1,7 +1,7 @@
 import os
+import copy
 import numpy as np
 import networkx as nx
-from math import sqrt
 from pyvis.network import Network
 from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, \
     QVBoxLayout, QPushButton, QLineEdit, QLabel, QGridLayout, \
@@ -10,14 +10,22 @@ from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, \
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtGui import QIntValidator, QDoubleValidator
 from PySide6.QtCore import Qt
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
 from trp_logic import Logic
+import trp_metrics as tm
 import config as cf
 
 
+# a chain that cannot be sampled, or a computation server that is down or rejects a request
+COMPUTATION_ERRORS = (ValueError, ConnectionError, RuntimeError)
+
+
 class MainWindow(QMainWindow):
-    def __init__(self, app_: QApplication):
+    def __init__(self, app_: QApplication, logic_: Logic = None):
         super().__init__()
         self.app = app_
+        self.logic = logic_ if logic_ is not None else Logic()
         self.setStyleSheet(cf.DEFAULT_APP_STYLE_SHEET)
         self.window_manager = WindowManager(self)
         self.setCentralWidget(self.window_manager)
@@ -259,7 +267,16 @@ class  SettingsDialog(AbstractToolDialog):
         if self.is_check_stochastic and not self.matrix_edit_widget.check_stochastic():
             QMessageBox.warning(self.main_app, "Что-то не так", "Матрица или вектор не являются стохастическими", QMessageBox.Ok)
             return
+        # compute the new chain on a copy first, so a failure leaves the app untouched
+        logic = copy.copy(self.main_app.logic)
+        self.matrix_edit_widget.set_to_logic(logic)
+        try:
+            convergence = self.main_app.compute_convergence(logic)
+        except COMPUTATION_ERRORS as e:
+            self.main_app.show_error(e)
+            return
         self.matrix_edit_widget.set_to_logic(self.main_app.logic)
+        self.main_app.set_convergence(convergence)
         self.main_app.t_widget.set_value(1)
         self.close()
     
@@ -354,19 +371,15 @@ class MatrixWidget(QWidget):
                 self.matrix[i][j].setVisible(i < n_ and j < n_)
         self.n = n_
 
-    def set_from_logic(self, logic_: Logic, t_: int = 1) -> None:
+    def set_from_logic(self, logic_: Logic, v_: np.array, sv_: np.array, norm_: float, t_: int = 1) -> None:
         P = logic_.get_matrix(t_)
         self.reshape(len(P))
-        v = np.array(logic_.get_vector(t_))
-        sv = logic_.get_statistic_vector(t_)
-        n2 = 0
         for i in range(self.n):
-            n2 += (v[i] - sv[i]) * (v[i] - sv[i])
-            self.vector.vector[i].set_value(v[i])
-            self.svector.vector[i].set_value(sv[i])
+            self.vector.vector[i].set_value(v_[i])
+            self.svector.vector[i].set_value(sv_[i])
             for j in range(self.n):
                 self.matrix[i][j].set_value(P[i, j])
-        self.norm_label.setText("\t" + str(round(sqrt(n2), 4)))
+        self.norm_label.setText("\t" + str(round(norm_, 4)))
 
     
 class GraphWidget(QWidget):
@@ -434,9 +447,15 @@ class ParameterTWidget(QWidget):
     
     def change_t_parameter(self) -> None:
         t = self.slider.value()
-        self.main_app.matrix_widget.set_from_logic(self.main_app.logic, t)
-        self.main_app.graph_widget.set_from_logic(self.main_app.logic, t)
+        try:
+            # P(t) is fetched before any widget changes and then reused by the graph
+            self.main_app.set_matrix_t(t)
+            self.main_app.graph_widget.set_from_logic(self.main_app.logic, t)
+        except COMPUTATION_ERRORS as e:
+            self.main_app.show_error(e)
+            return
         self.main_app.trajectory_widget.set_new_trajectory()
+        self.main_app.convergence_widget.set_t(t)
         self.t_value_widget.setText(str(t))
 
 
@@ -461,7 +480,11 @@ class TrajectoryWidget(QWidget):
     
     def set_new_trajectory(self) -> None:
         t = self.main_app.t_widget.value()
-        tr = self.main_app.logic.get_trajectory(t)
+        try:
+            tr = self.main_app.logic.get_trajectory(t)
+        except COMPUTATION_ERRORS as e:
+            self.main_app.show_error(e)
+            return
         M = [] * (t + 1)
         for i in range(t + 1):
             M.append([0] * (t + 1))
@@ -474,17 +497,55 @@ class TrajectoryWidget(QWidget):
         self.graph_widget.set_from_graph(G)
            
 
+class ConvergenceWidget(QWidget):
+    def __init__(self, parent_: QWidget = None):
+        super().__init__(parent_)
+        self.figure = Figure(figsize=(5, 3), tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.t_line = None
+        self.mixing_label = QLabel(self)
+
+        self._widgets_to_layout()
+
+    def _widgets_to_layout(self) -> None:
+        layout = QFormLayout()
+        layout.addWidget(self.canvas)
+        layout.addRow("Время\nперемешивания", self.mixing_label)
+        self.setLayout(layout)
+
+    def set_from_convergence(self, convergence_: tm.Convergence, t_: int = 1) -> None:
+        tm.plot_convergence(self.ax, convergence_.metrics, convergence_.eps, convergence_.t_mix)
+        self.t_line = self.ax.axvline(t_, color='red', linewidth=1)
+        if convergence_.is_periodic():
+            self.mixing_label.setText("\tцепь периодическая")
+        elif convergence_.t_mix is None:
+            self.mixing_label.setText(f"\t> {len(convergence_.V_path) - 1}")
+        else:
+            self.mixing_label.setText(f"\t{convergence_.t_mix}  (ε = {convergence_.eps})")
+        self.canvas.draw_idle()
+
+    def set_t(self, t_: int) -> None:
+        if self.t_line is None:
+            return
+        self.t_line.set_xdata([t_, t_])
+        self.canvas.draw_idle()
+
+
 class MainAppWidget(ICentralWidget):
     def __init__(self, window_manager_):
         super().__init__(window_manager_)
-        self.logic = Logic()
+        self.logic = self.window_manager.main_window.logic
+        self.convergence = self.compute_convergence(self.logic)
         self.settings_dialog = SettingsDialog(self)
         self.t_widget = ParameterTWidget(self)
         self.matrix_widget = MatrixWidget(self)
-        self.matrix_widget.set_from_logic(self.logic)
+        self.set_matrix_t(1)
         self.graph_widget = GraphWidget(self)
         self.graph_widget.set_from_logic(self.logic)
         self.trajectory_widget = TrajectoryWidget(self)
+        self.convergence_widget = ConvergenceWidget(self)
+        self.convergence_widget.set_from_convergence(self.convergence)
 
         self.menu_bar = QMenuBar(self)
         self.menu_bar.setNativeMenuBar(False)
@@ -496,6 +557,23 @@ class MainAppWidget(ICentralWidget):
 
         self._widgets_to_layout()
 
+    def compute_convergence(self, logic_: Logic) -> tm.Convergence:
+        return tm.Convergence(logic_.get_vector_path(cf.MAXIMUM_T),
+                              logic_.get_statistic_path(cf.MAXIMUM_T),
+                              logic_.get_matrix())
+
+    def set_convergence(self, convergence_: tm.Convergence) -> None:
+        self.convergence = convergence_
+        self.convergence_widget.set_from_convergence(self.convergence)
+
+    def show_error(self, error_: Exception) -> None:
+        QMessageBox.warning(self, "Что-то не так", f"Не удалось выполнить вычисления: {error_}", QMessageBox.Ok)
+
+    def set_matrix_t(self, t_: int) -> None:
+        self.matrix_widget.set_from_logic(self.logic, self.convergence.V_path[t_],
+                                          self.convergence.S_path[t_],
+                                          self.convergence.metrics['L2'][t_], t_)
+
     def __actions_init(self) -> None:
         self.settings_action.triggered.connect(self.settings_dialog.run)
         self.exit_action.triggered.connect(self.window_manager.exit)
@@ -507,5 +585,8 @@ class MainAppWidget(ICentralWidget):
         tmp.addWidget(self.graph_widget)
         layout.addLayout(tmp)
         layout.addWidget(self.t_widget)
-        layout.addWidget(self.trajectory_widget)
+        tmp = QHBoxLayout()
+        tmp.addWidget(self.trajectory_widget)
+        tmp.addWidget(self.convergence_widget)
+        layout.addLayout(tmp)
         self.setLayout(layout)
\ No newline at end of file
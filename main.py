@@ -1,9 +1,25 @@
 import sys
+import argparse
 from PySide6.QtWidgets import QApplication
 from gui_logic import MainWindow
+from trp_server import RemoteLogic
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = MainWindow(app)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--server', metavar='HOST:PORT', default=None,
+                        help="использовать сервер вычислений trp_server.py")
+    args, qt_args = parser.parse_known_args()
+    logic = None
+    if args.server is not None:
+        host, sep, port = args.server.rpartition(':')
+        if not sep or not host or not port.isdigit():
+            parser.error("--server должен иметь вид HOST:PORT")
+        logic = RemoteLogic(host, int(port))
+        try:
+            logic.check_connection()
+        except (ConnectionError, RuntimeError) as e:
+            parser.exit(1, f"Не удалось подключиться к серверу вычислений: {e}\n")
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = MainWindow(app, logic)
     window.showMaximized()
     app.exec()
\ No newline at end of file
@@ -35,7 +35,18 @@ class Logic:
         if t_ == 0:
             return self.V0
         return np.array(np.dot(self.V0, self.get_matrix(t_)))[0]
-    
+
+    def get_matrix_path(self, t_: int) -> np.array:
+        if t_ >= 1:
+            self.get_matrix(t_)
+        path = [np.identity(self.get_dimension())]
+        for t in range(1, t_ + 1):
+            path.append(np.asarray(self.P_dict[t]))
+        return np.array(path)
+
+    def get_vector_path(self, t_: int) -> np.array:
+        return np.asarray(self.V0) @ self.get_matrix_path(t_)
+
     def get_graph(self, P_: np.matrix) -> nx.DiGraph:
         G = nx.from_numpy_array(P_, create_using=nx.DiGraph)
         for i in range(len(P_)):
@@ -46,29 +57,43 @@ class Logic:
                     G[i][j]['label'] = str(round(P_[i, j], 2))
         return G
     
-    def get_trajectory(self, t_: int) -> np.array:
-        tr = np.zeros((t_ + 1), dtype=int)
-        d = self.get_dimension()
-        tr[0] = np.random.choice(np.arange(d), p=self.get_vector(0))
+    def get_trajectories(self, t_: int, n_: int = None) -> np.array:
+        n = self.N if n_ is None else n_
+        P_cum = np.cumsum(normalize_rows(self.get_matrix(1)), axis=1)
+        v_cum = np.cumsum(normalize_rows([self.get_vector(0)])[0])
+        if v_cum[-1] == 0:
+            raise ValueError("initial distribution has a zero sum")
+        is_zero_row = P_cum[:, -1] == 0
+        trs = np.zeros((n, t_ + 1), dtype=int)
+        trs[:, 0] = np.searchsorted(v_cum, np.random.random(n), side='right')
         for i in range(1, t_ + 1):
-            v = np.zeros((d))
-            P = self.get_matrix(i)
-            for j in range(d):
-                v[j] = P[tr[i - 1], j]
-            tr[i] = np.random.choice(np.arange(d), p=v)
-        return tr
-    
+            # like the old sampler, fail only once a row without transitions is reached
+            stuck = trs[:, i - 1][is_zero_row[trs[:, i - 1]]]
+            if len(stuck):
+                raise ValueError(f"state {stuck[0]} has no transitions")
+            u = np.random.random(n)
+            trs[:, i] = (P_cum[trs[:, i - 1]] <= u[:, None]).sum(axis=1)
+        return trs
+
+    def get_trajectory(self, t_: int) -> np.array:
+        return self.get_trajectories(t_, 1)[0]
+
     def get_trajectory_endings(self, t_: int) -> list:
-        return [self.get_trajectory(t_)[-1] for _ in range(self.N)]
+        return list(self.get_trajectories(t_)[:, -1])
+
+    def get_statistic_path(self, t_: int) -> np.array:
+        trs = self.get_trajectories(t_)
+        return (trs[:, :, None] == np.arange(self.get_dimension())).mean(axis=0)
 
     def get_statistic_vector(self, t_: int) -> np.array:
-        vec = np.zeros((self.get_dimension()))
-        trs = self.get_trajectory_endings(t_)
-        for i in range(len(trs)):
-            vec[trs[i]] += 1
-        # for i in range(len(self.P)):
-        #     vec[i] /= N
-        return vec / self.N
+        return self.get_statistic_path(t_)[t_]
+
+
+def normalize_rows(P_: np.matrix) -> np.array:
+    # rows are checked as stochastic only up to cf.EPS, zero rows stay zero
+    P = np.asarray(P_, dtype=float)
+    sums = P.sum(axis=1, keepdims=True)
+    return np.divide(P, sums, out=np.zeros_like(P), where=sums > 0)
 
 
 def print_matrix(P_: np.matrix, t_: int = 1) -> None:
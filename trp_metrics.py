@@ -0,0 +1,120 @@
+from typing import Optional
+import numpy as np
+from matplotlib.axes import Axes
+from trp_logic import normalize_rows
+import config as cf
+
+
+# All distances reduce over the last axis, so they accept single vectors
+# of shape (n,) as well as whole paths of shape (t + 1, n) at once.
+
+def l2_distance(p_: np.array, q_: np.array) -> np.array:
+    return np.linalg.norm(np.asarray(p_) - np.asarray(q_), axis=-1)
+
+
+def tv_distance(p_: np.array, q_: np.array) -> np.array:
+    return 0.5 * np.abs(np.asarray(p_) - np.asarray(q_)).sum(axis=-1)
+
+
+def kl_divergence(p_: np.array, q_: np.array) -> np.array:
+    # KL(p || q), 0 * log(0 / q) = 0 and p * log(p / 0) = inf
+    p = np.asarray(p_, dtype=float)
+    q = np.asarray(q_, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(p > 0, p * np.log(p / q), 0.)
+    return terms.sum(axis=-1)
+
+
+def chi_square(p_: np.array, q_: np.array) -> np.array:
+    # sum (p - q)^2 / q over the support of q, inf if p leaves it;
+    # multiply by the number of trajectories to get Pearson's statistic
+    p = np.asarray(p_, dtype=float)
+    q = np.asarray(q_, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(q > 0, (p - q) ** 2 / q, np.where(p > 0, np.inf, 0.))
+    return terms.sum(axis=-1)
+
+
+METRICS = {
+    'L2': l2_distance,
+    'TV': tv_distance,
+    'KL': kl_divergence,
+    'χ²': chi_square,
+}
+
+
+def convergence_metrics(V_path_: np.array, S_path_: np.array) -> dict:
+    return {name: metric(S_path_, V_path_) for name, metric in METRICS.items()}
+
+
+def matrix_power_path(P_: np.array, t_: int) -> np.array:
+    P = np.asarray(P_, dtype=float)
+    path = np.empty((t_ + 1,) + P.shape)
+    path[0] = np.identity(len(P))
+    for t in range(1, t_ + 1):
+        path[t] = path[t - 1] @ P
+    return path
+
+
+def limit_matrix(P_: np.matrix, max_iter_: int = 64) -> Optional[np.array]:
+    # P^(2^k) by repeated squaring of the row-normalized matrix; its powers
+    # stay bounded, so P^t has no limit only if the chain is periodic (None)
+    P = normalize_rows(P_)
+    L = P
+    for _ in range(max_iter_):
+        L_next = L @ L
+        if np.allclose(L_next, L, atol=1e-12):
+            break
+        L = L_next
+    if not np.allclose(L @ P, L, atol=1e-9):
+        return None
+    return L
+
+
+def worst_case_tv_path(P_path_: np.array, P_inf_: np.array) -> np.array:
+    # d(t) = max_i TV(P^t(i, .), P^inf(i, .))
+    return tv_distance(P_path_, np.asarray(P_inf_)).max(axis=-1)
+
+
+def mixing_time(distances_: np.array, eps_: float = cf.MIXING_EPS) -> Optional[int]:
+    # first t after which the distance stays within eps, None if never
+    above = np.nonzero(np.asarray(distances_) > eps_)[0]
+    if not len(above):
+        return 0
+    if above[-1] + 1 == len(distances_):
+        return None
+    return int(above[-1] + 1)
+
+
+def plot_convergence(ax_: Axes, metrics_: dict, eps_: float = None,
+                     t_mix_: int = None) -> None:
+    ax_.clear()
+    for name, values in metrics_.items():
+        t = np.arange(len(values))
+        finite = np.isfinite(values)
+        ax_.plot(t[finite], values[finite], label=name)
+    if eps_ is not None:
+        ax_.axhline(eps_, color='gray', linestyle=':', label=f'ε = {eps_}')
+    if t_mix_ is not None:
+        ax_.axvline(t_mix_, color='gray', linestyle='--', label=f't_mix = {t_mix_}')
+    ax_.set_yscale('symlog', linthresh=1e-3)
+    ax_.set_xlabel('t')
+    ax_.legend(loc='upper right')
+
+
+class Convergence:
+    def __init__(self, V_path_: np.array, S_path_: np.array, P_: np.matrix,
+                 eps_: float = cf.MIXING_EPS):
+        self.V_path = np.asarray(V_path_)
+        self.S_path = np.asarray(S_path_)
+        self.metrics = convergence_metrics(self.V_path, self.S_path)
+        self.eps = eps_
+        P = normalize_rows(P_)
+        self.P_inf = limit_matrix(P)
+        self.t_mix = None
+        if self.P_inf is not None:
+            d = worst_case_tv_path(matrix_power_path(P, len(self.V_path) - 1), self.P_inf)
+            self.t_mix = mixing_time(d, eps_)
+
+    def is_periodic(self) -> bool:
+        return self.P_inf is None
@@ -0,0 +1,311 @@
+import asyncio
+import argparse
+import hashlib
+import json
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from trp_logic import Logic
+import config as cf
+
+
+# method -> does the result depend only on (chain, t) and may be shared;
+# 'statistic' is shared as a whole path up to t, so one answer never mixes
+# several simulations
+METHODS = {
+    'matrix': True,
+    'vector': True,
+    'statistic': True,
+    'trajectory': False,
+}
+
+
+class RequestError(Exception):
+    pass
+
+
+class Chain:
+    def __init__(self, P_: list, V0_: list, N_: int):
+        try:
+            self.P = np.array(P_, dtype=float)
+            self.V0 = np.array(V0_, dtype=float)
+        except (ValueError, TypeError):
+            raise RequestError("P and V0 must be numeric arrays")
+        if not isinstance(N_, int) or isinstance(N_, bool):
+            raise RequestError("N must be an integer")
+        self.N = N_
+        if self.P.ndim != 2 or self.P.shape[0] != self.P.shape[1] or not len(self.P):
+            raise RequestError("P must be a non-empty square matrix")
+        if len(self.P) > cf.MAXIMUM_MATRIX_SIZE:
+            raise RequestError(f"dimension must not exceed {cf.MAXIMUM_MATRIX_SIZE}")
+        if self.V0.shape != (len(self.P),):
+            raise RequestError("V0 must match the dimension of P")
+        if not np.all(np.isfinite(self.P)) or not np.all(np.isfinite(self.V0)):
+            raise RequestError("P and V0 must be finite")
+        if np.any(self.P < 0) or np.any(self.P > 1) or np.any(self.V0 < 0) or np.any(self.V0 > 1):
+            raise RequestError("probabilities must lie in [0, 1]")
+        if np.any(self.P.sum(axis=1) <= 0) or self.V0.sum() <= 0:
+            raise RequestError("every row of P and V0 must have a positive sum")
+        if self.N < 0 or self.N > cf.SERVER_MAXIMUM_N:
+            raise RequestError(f"N must be between 0 and {cf.SERVER_MAXIMUM_N}")
+
+    def key(self, method_: str) -> str:
+        # P(t) depends on P only, V(t) also on V0, simulations also on N
+        h = hashlib.sha1(self.P.tobytes())
+        h.update(str(self.P.shape).encode())
+        if method_ != 'matrix':
+            h.update(self.V0.tobytes())
+        if method_ in ('statistic', 'trajectory'):
+            h.update(str(self.N).encode())
+        return h.hexdigest()
+
+
+def compute_batch(method_: str, P_: np.array, V0_: np.array, N_: int, ts_: list) -> list:
+    logic = Logic()
+    logic.set_matrix(np.matrix(P_))
+    logic.set_vector(V0_)
+    logic.N = N_
+    T = max(ts_)
+    if method_ == 'matrix':
+        path = logic.get_matrix_path(T)
+    elif method_ == 'vector':
+        path = logic.get_vector_path(T)
+    elif method_ == 'statistic':
+        path = logic.get_statistic_path(T)
+        return [path[:t + 1].tolist() for t in ts_]
+    else:
+        return [logic.get_trajectory(t).tolist() for t in ts_]
+    return [path[t].tolist() for t in ts_]
+
+
+class ComputationService:
+    def __init__(self, workers_: int = None,
+                 batch_delay_: float = cf.SERVER_BATCH_DELAY,
+                 cache_size_: int = cf.SERVER_CACHE_SIZE):
+        self.workers = workers_
+        self.executor = self.__new_executor()
+        self.batch_delay = batch_delay_
+        self.cache_size = cache_size_
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.pending = {}
+        self.tasks = set()
+
+    def __new_executor(self) -> ProcessPoolExecutor:
+        # reseed every worker, forked processes would share the RNG state
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=np.random.seed)
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+    async def query(self, method_: str, chain_: Chain, t_: int):
+        if not METHODS[method_]:
+            return await self.__enqueue(method_, chain_, t_, None)
+        key = (method_, chain_.key(method_), t_)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if key not in self.in_flight:
+            self.in_flight[key] = self.__enqueue(method_, chain_, t_, key)
+        return await asyncio.shield(self.in_flight[key])
+
+    def __enqueue(self, method_: str, chain_: Chain, t_: int, key_) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        batch_key = (method_, chain_.key(method_))
+        if batch_key not in self.pending:
+            self.pending[batch_key] = []
+            loop.call_later(self.batch_delay, self.__flush, batch_key, chain_)
+        future = loop.create_future()
+        self.pending[batch_key].append((t_, key_, future))
+        return future
+
+    def __flush(self, batch_key_: tuple, chain_: Chain) -> None:
+        items = self.pending.pop(batch_key_)
+        task = asyncio.ensure_future(self.__run_batch(batch_key_[0], chain_, items))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def __run_batch(self, method_: str, chain_: Chain, items_: list) -> None:
+        loop = asyncio.get_running_loop()
+        ts = [t for t, _, _ in items_]
+        executor = self.executor
+        try:
+            results = await loop.run_in_executor(
+                executor, compute_batch, method_, chain_.P, chain_.V0, chain_.N, ts)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and executor is self.executor:
+                # a worker died (e.g. killed by the OS), later jobs need a new pool
+                executor.shutdown(wait=False)
+                self.executor = self.__new_executor()
+            for _, key, future in items_:
+                self.in_flight.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, key, future), result in zip(items_, results):
+            if key is not None:
+                self.__store(key, result)
+                self.in_flight.pop(key, None)
+            if not future.done():
+                future.set_result(result)
+
+    def __store(self, key_: tuple, value_) -> None:
+        self.cache[key_] = value_
+        self.cache.move_to_end(key_)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+class Server:
+    def __init__(self, service_: ComputationService):
+        self.service = service_
+
+    async def handle(self, request_: dict):
+        if not isinstance(request_, dict):
+            raise RequestError("request must be a JSON object")
+        method = request_.get('method')
+        if method not in METHODS:
+            raise RequestError(f"unknown method {method!r}")
+        if 'P' not in request_ or 'V0' not in request_:
+            raise RequestError("P and V0 are required")
+        chain = Chain(request_['P'], request_['V0'], request_.get('N', cf.N))
+        t = request_.get('t', 1)
+        ts = t if isinstance(t, list) else [t]
+        if not ts:
+            return []
+        if len(ts) > cf.MAXIMUM_T + 1:
+            raise RequestError(f"at most {cf.MAXIMUM_T + 1} values of t per request")
+        for t_i in ts:
+            if not isinstance(t_i, int) or isinstance(t_i, bool) or t_i < 0 or t_i > cf.MAXIMUM_T:
+                raise RequestError(f"t must be an integer between 0 and {cf.MAXIMUM_T} or a list of them")
+        if method == 'statistic':
+            path = await self.service.query(method, chain, max(ts))
+            results = [path[t_i] for t_i in ts]
+        else:
+            results = await asyncio.gather(*[self.service.query(method, chain, t_i) for t_i in ts])
+        return list(results) if isinstance(t, list) else results[0]
+
+    async def serve_connection(self, reader_: asyncio.StreamReader,
+                               writer_: asyncio.StreamWriter) -> None:
+        try:
+            status, payload = await self.__respond(reader_)
+            body = json.dumps(payload).encode()
+            writer_.write(f"HTTP/1.1 {status}\r\n"
+                          "Content-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n"
+                          "Connection: close\r\n\r\n".encode() + body)
+            await writer_.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer_.close()
+
+    async def __respond(self, reader_: asyncio.StreamReader) -> tuple:
+        try:
+            request_line = (await reader_.readline()).decode('latin-1').split()
+            length = 0
+            while True:
+                line = (await reader_.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            if length > cf.SERVER_MAXIMUM_BODY:
+                raise ValueError("request body is too large")
+            if len(request_line) < 2 or request_line[0] != 'POST':
+                return "405 Method Not Allowed", {'error': "only POST is supported"}
+            request = json.loads(await reader_.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            return "400 Bad Request", {'error': f"malformed request: {e}"}
+        try:
+            return "200 OK", {'result': await self.handle(request)}
+        except RequestError as e:
+            return "400 Bad Request", {'error': str(e)}
+        except Exception as e:
+            return "500 Internal Server Error", {'error': f"{type(e).__name__}: {e}"}
+
+
+async def serve(host_: str = cf.SERVER_HOST, port_: int = cf.SERVER_PORT,
+                workers_: int = None) -> None:
+    service = ComputationService(workers_)
+    try:
+        server = Server(service)
+        tcp_server = await asyncio.start_server(server.serve_connection, host_, port_)
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        service.close()
+
+
+class RemoteLogic(Logic):
+    def __init__(self, host_: str = cf.SERVER_HOST, port_: int = cf.SERVER_PORT):
+        super().__init__()
+        self.url = f"http://{host_}:{port_}/"
+        # the server is local, never send its requests through http_proxy
+        self.opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def _request(self, method_: str, t_):
+        request = {
+            'method': method_,
+            'P': np.asarray(self.P_dict[1]).tolist(),
+            'V0': np.asarray(self.V0).tolist(),
+            'N': self.N,
+            't': t_,
+        }
+        http_request = urllib.request.Request(
+            self.url, data=json.dumps(request).encode(),
+            headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(http_request, timeout=cf.SERVER_TIMEOUT) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                payload = json.loads(e.read())
+            except ValueError:
+                payload = {'error': f"{e.code} {e.reason}"}
+        except (urllib.error.URLError, OSError) as e:
+            raise ConnectionError(f"no response from the server at {self.url}: {e}")
+        if 'error' in payload:
+            raise RuntimeError(payload['error'])
+        return payload['result']
+
+    def check_connection(self) -> None:
+        self._request('matrix', 1)
+
+    def get_matrix(self, t_: int = 1) -> np.matrix:
+        if t_ not in self.P_dict:
+            self.P_dict[t_] = np.matrix(self._request('matrix', t_))
+        return self.P_dict[t_]
+
+    def get_vector(self, t_: int = 1) -> np.array:
+        if t_ == 0:
+            return self.V0
+        return np.array(self._request('vector', t_))
+
+    def get_matrix_path(self, t_: int) -> np.array:
+        return np.array(self._request('matrix', list(range(t_ + 1))))
+
+    def get_vector_path(self, t_: int) -> np.array:
+        return np.array(self._request('vector', list(range(t_ + 1))))
+
+    def get_trajectory(self, t_: int) -> np.array:
+        return np.array(self._request('trajectory', t_), dtype=int)
+
+    def get_statistic_vector(self, t_: int) -> np.array:
+        return np.array(self._request('statistic', t_))
+
+    def get_statistic_path(self, t_: int) -> np.array:
+        return np.array(self._request('statistic', list(range(t_ + 1))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Сервер вычислений для марковских цепей")
+    parser.add_argument('--host', default=cf.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=cf.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.workers))